@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Poll, Option, Vote
+from .models import Poll, Option, Vote, PollTrendingScore
 
 
 @admin.register(Poll)
@@ -21,3 +21,10 @@ class VoteAdmin(admin.ModelAdmin):
     list_display = ['option', 'created_at']
     list_filter = ['created_at', 'option__poll']
     search_fields = ['option__text', 'option__poll__question']
+
+
+@admin.register(PollTrendingScore)
+class PollTrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ['poll', 'log_score', 'updated_at']
+    ordering = ['-log_score']
+    search_fields = ['poll__question']
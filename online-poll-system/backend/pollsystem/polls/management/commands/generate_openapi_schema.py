@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pollsystem.openapi import generate_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once and write it to a static file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help="Output path (default: settings.OPENAPI_SCHEMA_FILE). "
+                 "A .yaml/.yml suffix writes YAML, anything else JSON.",
+        )
+
+    def handle(self, *args, **options):
+        from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+        output = Path(options['output'] or settings.OPENAPI_SCHEMA_FILE)
+        codec_class = OpenAPICodecYaml if output.suffix in ('.yaml', '.yml') else OpenAPICodecJson
+
+        body = codec_class(validators=[]).encode(generate_schema())
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_bytes(body)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote OpenAPI schema to {output}"))
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from polls import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly vote partitions and detach old ones. "
+        "Run it regularly (e.g. daily from cron) when VOTE_PARTITION_STRATEGY is 'month'."
+    )
+
+    def add_arguments(self, parser):
+        options = settings.VOTE_PARTITION_SETTINGS
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--convert',
+            action='store_true',
+            help="Partition an existing plain vote table using VOTE_PARTITION_STRATEGY.",
+        )
+        mode.add_argument(
+            '--revert',
+            action='store_true',
+            help="Turn a partitioned vote table back into a plain table.",
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=options['MONTHS_AHEAD'],
+            help="Number of future monthly partitions to keep ready.",
+        )
+        parser.add_argument(
+            '--retain-months',
+            type=int,
+            default=options['RETAIN_MONTHS'],
+            help="Detach partitions older than this many months (0 keeps everything).",
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help="Drop detached partitions instead of moving them to VOTE_ARCHIVE_SCHEMA.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Vote partitioning requires PostgreSQL.")
+        if options['drop'] and options['retain_months'] <= 0:
+            raise CommandError("--drop needs --retain-months greater than 0.")
+
+        with transaction.atomic():
+            if options['revert']:
+                self.revert()
+                return
+            if options['convert']:
+                self.convert(options['months_ahead'])
+
+            strategy = partitioning.get_strategy(connection)
+            if strategy is None:
+                raise CommandError("The vote table is not partitioned; run with --convert first.")
+            if strategy != 'month':
+                self.stdout.write(f"Vote table is {strategy}-partitioned; nothing to maintain.")
+                return
+
+            for name in partitioning.create_future_partitions(connection, options['months_ahead']):
+                self.stdout.write(f"Created partition {name}")
+
+            if options['retain_months'] > 0:
+                archive_schema = None if options['drop'] else settings.VOTE_PARTITION_SETTINGS['ARCHIVE_SCHEMA']
+                archived = partitioning.archive_old_partitions(
+                    connection, options['retain_months'], archive_schema,
+                )
+                for name in archived:
+                    if archive_schema:
+                        self.stdout.write(f"Moved partition {name} to schema {archive_schema}")
+                    else:
+                        self.stdout.write(f"Dropped partition {name}")
+
+        self.stdout.write(self.style.SUCCESS("Vote partitions are up to date."))
+
+    def convert(self, months_ahead):
+        strategy = settings.VOTE_PARTITION_SETTINGS['STRATEGY']
+        if not strategy:
+            raise CommandError("Set VOTE_PARTITION_STRATEGY to 'month' or 'hash' before converting.")
+        if partitioning.get_strategy(connection) is not None:
+            self.stdout.write("Vote table is already partitioned.")
+            return
+        try:
+            partitioning.partition_vote_table(connection, strategy, months_ahead=months_ahead)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Partitioned the vote table by {strategy}."))
+
+    def revert(self):
+        if partitioning.get_strategy(connection) is None:
+            self.stdout.write("Vote table is not partitioned.")
+            return
+        partitioning.unpartition_vote_table(connection)
+        self.stdout.write(self.style.SUCCESS("Converted the vote table back to a plain table."))
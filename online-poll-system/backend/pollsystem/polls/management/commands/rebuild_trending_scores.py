@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute trending poll scores from recent votes (for cold starts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=None,
+            help="Only replay votes from the last N hours "
+                 "(default: 20 half-lives, beyond which votes no longer matter).",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Replay every vote.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if not options['all']:
+            hours = options['hours'] if options['hours'] is not None else 20 * trending.half_life_hours()
+            since = timezone.now() - timedelta(hours=hours)
+
+        count = trending.rebuild_scores(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {count} polls."))
@@ -33,3 +33,18 @@ class Vote(models.Model):
 
     def __str__(self):
         return f"Vote for {self.option.text}"
+
+
+class PollTrendingScore(models.Model):
+    """
+    Exponentially decayed vote activity of a poll, maintained by ``polls.trending``.
+
+    ``log_score`` is stored relative to a fixed epoch, so scores of different
+    polls stay comparable without ever being decayed in place.
+    """
+    poll = models.OneToOneField(Poll, related_name='trending', on_delete=models.CASCADE, primary_key=True)
+    log_score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trending score for {self.poll.question}"
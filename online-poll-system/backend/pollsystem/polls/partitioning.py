@@ -0,0 +1,296 @@
+"""
+Opt-in PostgreSQL declarative partitioning of the vote table.
+
+Two strategies are supported, selected with ``VOTE_PARTITION_SETTINGS['STRATEGY']``:
+
+* ``'month'`` range-partitions ``polls_vote`` on ``created_at``, one partition
+  per calendar month plus a default partition. Future partitions are created
+  ahead of time and old ones can be detached into an archive schema by the
+  ``maintain_vote_partitions`` command.
+* ``'hash'`` hash-partitions ``polls_vote`` on ``option_id``, so counting the
+  votes of one option only touches a single partition.
+
+The Django model is unchanged: ``id`` stays the ORM primary key, while the
+database primary key also includes the partition key, as PostgreSQL requires.
+Existing indexes and check, unique and foreign key constraints are carried
+over. Unique constraints that do not include the partition key cannot be
+enforced by PostgreSQL, so conversion refuses to run while one exists.
+"""
+
+import datetime
+import re
+
+from django.conf import settings
+from django.utils import timezone
+
+
+VOTE_TABLE = 'polls_vote'
+OLD_TABLE = 'polls_vote_old'
+ID_SEQUENCE = 'polls_vote_id_seq'
+DEFAULT_PARTITION = 'polls_vote_default'
+# Indexes added only for the partitioned layout; dropped again on revert.
+PARTITION_INDEX_PREFIX = 'polls_vote_part_'
+STRATEGIES = ('month', 'hash')
+
+_MONTH_PARTITION_RE = re.compile(r'^polls_vote_p(\d{4})_(\d{2})$')
+
+
+def get_strategy(connection):
+    """Return the strategy the vote table is partitioned with, or ``None``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT partstrat FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [VOTE_TABLE],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {'r': 'month', 'h': 'hash'}.get(row[0], row[0])
+
+
+def month_start(value, offset=0):
+    """Return the first instant (UTC) of the month ``offset`` months after ``value``."""
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime.datetime(index // 12, index % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def month_partition_name(start):
+    return f'polls_vote_p{start.year:04d}_{start.month:02d}'
+
+
+def partition_vote_table(connection, strategy, months_ahead=None, hash_partitions=None):
+    """
+    Convert the plain vote table into a partitioned one, keeping all rows.
+
+    Runs in the caller's transaction; on large tables the row copy dominates,
+    so schedule it in a maintenance window.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown vote partitioning strategy {strategy!r}; expected one of {STRATEGIES}.")
+    options = settings.VOTE_PARTITION_SETTINGS
+    if months_ahead is None:
+        months_ahead = options['MONTHS_AHEAD']
+    if hash_partitions is None:
+        hash_partitions = options['HASH_PARTITIONS']
+
+    if strategy == 'month':
+        partition_key, clause = 'created_at', 'RANGE (created_at)'
+    else:
+        partition_key, clause = 'option_id', 'HASH (option_id)'
+
+    with connection.cursor() as cursor:
+        definition = _begin_rebuild(cursor, clause, partition_key)
+
+        if strategy == 'month':
+            cursor.execute(f'SELECT MIN(created_at) FROM {OLD_TABLE}')
+            oldest = cursor.fetchone()[0] or timezone.now()
+            _create_month_partitions(cursor, month_start(oldest), month_start(timezone.now(), months_ahead))
+            cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {VOTE_TABLE} DEFAULT')
+        else:
+            for remainder in range(hash_partitions):
+                cursor.execute(
+                    f'CREATE TABLE polls_vote_h{remainder:02d} PARTITION OF {VOTE_TABLE} '
+                    f'FOR VALUES WITH (MODULUS {hash_partitions:d}, REMAINDER {remainder:d})'
+                )
+
+        definition['indexes'] += [
+            (f'{PARTITION_INDEX_PREFIX}option_created_idx',
+             f'CREATE INDEX {PARTITION_INDEX_PREFIX}option_created_idx ON {VOTE_TABLE} (option_id, created_at)'),
+            (f'{PARTITION_INDEX_PREFIX}created_idx',
+             f'CREATE INDEX {PARTITION_INDEX_PREFIX}created_idx ON {VOTE_TABLE} (created_at)'),
+        ]
+        _finish_rebuild(cursor, definition, ['id', partition_key])
+
+
+def unpartition_vote_table(connection):
+    """
+    Convert the partitioned vote table back into a plain table, keeping all rows.
+
+    The constraints and indexes carried over from the original table are
+    restored; the ones added only for partitioning are not.
+    """
+    with connection.cursor() as cursor:
+        definition = _begin_rebuild(cursor, None)
+        definition['indexes'] = [
+            (name, statement) for name, statement in definition['indexes']
+            if not name.startswith(PARTITION_INDEX_PREFIX)
+        ]
+        _finish_rebuild(cursor, definition, ['id'])
+
+
+def _table_definition(cursor):
+    """
+    Capture the vote table's constraints and indexes so they can be recreated.
+
+    Returns a dict with ``constraints`` as ``(name, type, definition, columns)``
+    tuples, excluding the primary key, and ``indexes`` as ``(name, statement)``
+    pairs for indexes that do not back a constraint.
+    """
+    cursor.execute(
+        "SELECT c.conname, c.contype, pg_get_constraintdef(c.oid), "
+        "ARRAY(SELECT a.attname::text FROM pg_attribute a "
+        "      WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)) "
+        "FROM pg_constraint c "
+        "WHERE c.conrelid = to_regclass(%s) AND c.contype IN ('c', 'u', 'x', 'f') "
+        "ORDER BY c.conname",
+        [VOTE_TABLE],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT ic.relname, pg_get_indexdef(i.indexrelid) "
+        "FROM pg_index i JOIN pg_class ic ON ic.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(%s) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid) "
+        "ORDER BY ic.relname",
+        [VOTE_TABLE],
+    )
+    # Indexes on a partitioned table are reported as ``ON ONLY``, which would
+    # not cascade to the partitions if replayed.
+    indexes = [(name, statement.replace(' ON ONLY ', ' ON ', 1)) for name, statement in cursor.fetchall()]
+    return {'constraints': constraints, 'indexes': indexes}
+
+
+def _begin_rebuild(cursor, partition_clause, partition_key=None):
+    """Move the current table aside and create an empty replacement with the same columns."""
+    definition = _table_definition(cursor)
+    if partition_key:
+        for name, contype, constraint, columns in definition['constraints']:
+            if contype in ('u', 'x') and partition_key not in columns:
+                raise ValueError(
+                    f"Cannot partition {VOTE_TABLE} on {partition_key}: constraint {name} "
+                    f"({constraint}) does not include the partition key, so PostgreSQL "
+                    f"cannot enforce it on a partitioned table. Drop or change it first."
+                )
+
+    cursor.execute(f'ALTER TABLE {VOTE_TABLE} RENAME TO {OLD_TABLE}')
+    create = f'CREATE TABLE {VOTE_TABLE} (LIKE {OLD_TABLE} INCLUDING COMMENTS INCLUDING STORAGE)'
+    if partition_clause:
+        create += f' PARTITION BY {partition_clause}'
+    cursor.execute(create)
+    return definition
+
+
+def _finish_rebuild(cursor, definition, primary_key):
+    """Copy the rows over, drop the old table, then add keys, indexes and the id sequence."""
+    cursor.execute(f'INSERT INTO {VOTE_TABLE} SELECT * FROM {OLD_TABLE}')
+    # Dropping the old table first frees its constraint, index and sequence names.
+    cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+    cursor.execute(f'ALTER TABLE {VOTE_TABLE} ADD PRIMARY KEY ({", ".join(primary_key)})')
+    for _name, statement in definition['indexes']:
+        cursor.execute(statement)
+    # Foreign keys go last, after the unique constraints they may rely on.
+    constraints = sorted(definition['constraints'], key=lambda constraint: constraint[1] == 'f')
+    for name, _contype, constraint, _columns in constraints:
+        cursor.execute(f'ALTER TABLE {VOTE_TABLE} ADD CONSTRAINT "{name}" {constraint}')
+
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'id'",
+        [VOTE_TABLE],
+    )
+    if cursor.fetchone()[0] in ('smallint', 'integer', 'bigint'):
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {ID_SEQUENCE}')
+        cursor.execute(f'ALTER SEQUENCE {ID_SEQUENCE} OWNED BY {VOTE_TABLE}.id')
+        cursor.execute(f"ALTER TABLE {VOTE_TABLE} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+        cursor.execute(
+            f"SELECT setval('{ID_SEQUENCE}', COALESCE((SELECT MAX(id) FROM {VOTE_TABLE}), 0) + 1, false)"
+        )
+
+
+def _create_month_partitions(cursor, start, end):
+    """
+    Create monthly partitions for every month from ``start`` up to and including ``end``.
+
+    Votes that already landed in the default partition for one of these
+    months (e.g. because maintenance ran late) are moved into the new one.
+    """
+    cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+    has_default = cursor.fetchone()[0] is not None
+
+    created = []
+    month = start
+    while month <= end:
+        name = month_partition_name(month)
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is None:
+            bounds = f"FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+            in_range = f"created_at >= '{month.isoformat()}' AND created_at < '{month_start(month, 1).isoformat()}'"
+            stranded = False
+            if has_default:
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})')
+                stranded = cursor.fetchone()[0]
+            if stranded:
+                # Attaching the range would violate the default partition's
+                # implicit constraint, so build the table standalone, move the
+                # rows into it, then attach it.
+                cursor.execute(f'CREATE TABLE {name} (LIKE {VOTE_TABLE} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) '
+                    f'INSERT INTO {name} SELECT * FROM moved'
+                )
+                cursor.execute(f'ALTER TABLE {VOTE_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}')
+            else:
+                cursor.execute(f'CREATE TABLE {name} PARTITION OF {VOTE_TABLE} FOR VALUES {bounds}')
+            created.append(name)
+        month = month_start(month, 1)
+    return created
+
+
+def list_month_partitions(connection):
+    """Return ``(name, month_start)`` pairs for the monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [VOTE_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = _MONTH_PARTITION_RE.match(name)
+        if match:
+            start = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+            partitions.append((name, start))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_future_partitions(connection, months_ahead):
+    """Make sure partitions exist from the current month through ``months_ahead`` months ahead."""
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        return _create_month_partitions(cursor, month_start(now), month_start(now, months_ahead))
+
+
+def archive_old_partitions(connection, retain_months, archive_schema=None):
+    """
+    Detach monthly partitions older than ``retain_months`` full months.
+
+    Detached partitions are moved into ``archive_schema`` if given, otherwise
+    dropped. Their votes no longer count towards poll results. Archived tables
+    keep their rows but lose their foreign keys, so they are no longer linked
+    to live options and polls, which can then be deleted as usual.
+    """
+    cutoff = month_start(timezone.now(), -retain_months)
+    archived = []
+    with connection.cursor() as cursor:
+        for name, start in list_month_partitions(connection):
+            if start >= cutoff:
+                break
+            cursor.execute(f'ALTER TABLE {VOTE_TABLE} DETACH PARTITION {name}')
+            if archive_schema:
+                # The detached table keeps the inherited foreign keys as its own;
+                # left in place they would block deleting polls with archived votes.
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+                    [name],
+                )
+                for (constraint,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"')
+                cursor.execute(f'ALTER TABLE {name} SET SCHEMA "{archive_schema}"')
+            else:
+                cursor.execute(f'DROP TABLE {name}')
+            archived.append(name)
+    return archived
@@ -41,6 +41,13 @@ class PollSerializer(serializers.ModelSerializer):
         return poll
 
 
+class TrendingPollSerializer(PollSerializer):
+    trending_score = serializers.FloatField(read_only=True)
+
+    class Meta(PollSerializer.Meta):
+        fields = PollSerializer.Meta.fields + ['trending_score']
+
+
 class VoteSerializer(serializers.Serializer):
     option_id = serializers.IntegerField()
 
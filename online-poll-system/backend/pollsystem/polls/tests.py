@@ -1,3 +1,477 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import clear_url_caches
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+import pollsystem.urls
+from pollsystem import openapi
+from pollsystem.log_handlers import JSONFormatter, QueueFileHandler, QueueStreamHandler, SamplingFilter
+from . import partitioning, trending
+from .models import Option, Poll, PollTrendingScore, Vote
+
+
+def trending_settings(**overrides):
+    return override_settings(POLL_SETTINGS={
+        **settings.POLL_SETTINGS,
+        'TRENDING_HALF_LIFE_HOURS': 6,
+        'TRENDING_MAX_RESULTS': 3,
+        'TRENDING_FLUSH_SECONDS': 0,
+        **overrides,
+    })
+
+
+def make_record(msg='Vote recorded', args=(), level=logging.INFO, **extra):
+    record = logging.LogRecord('polls.views', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class JSONFormatterTests(SimpleTestCase):
+    def test_formats_message_and_extras(self):
+        record = make_record('Vote for %s', ('cats',), event='vote', poll_id=3)
+        payload = json.loads(JSONFormatter().format(record))
+
+        self.assertEqual(payload['message'], 'Vote for cats')
+        self.assertEqual(payload['level'], 'INFO')
+        self.assertEqual(payload['logger'], 'polls.views')
+        self.assertEqual(payload['event'], 'vote')
+        self.assertEqual(payload['poll_id'], 3)
+        self.assertNotIn('args', payload)
+
+    def test_includes_exception_and_sample_rate(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('polls', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+        record.sample_rate = 0.5
+        payload = json.loads(JSONFormatter().format(record))
+
+        self.assertIn('ValueError: boom', payload['exc_info'])
+        self.assertEqual(payload['sample_rate'], 0.5)
+
+
+class SamplingFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.filter = SamplingFilter(rates={'vote': 0.25, 'never': 0.0, 'always': 1.0})
+
+    def test_untagged_and_unsampled_events_pass(self):
+        self.assertTrue(self.filter.filter(make_record()))
+        self.assertTrue(self.filter.filter(make_record(event='other')))
+        self.assertTrue(self.filter.filter(make_record(event='always')))
+
+    def test_zero_rate_drops_unless_warning(self):
+        self.assertFalse(self.filter.filter(make_record(event='never')))
+        self.assertTrue(self.filter.filter(make_record(event='never', level=logging.WARNING)))
+
+    def test_keeps_fraction_and_annotates_rate(self):
+        with mock.patch('pollsystem.log_handlers.random.random', return_value=0.1):
+            kept = make_record(event='vote')
+            self.assertTrue(self.filter.filter(kept))
+        with mock.patch('pollsystem.log_handlers.random.random', return_value=0.9):
+            dropped = make_record(event='vote')
+            self.assertFalse(self.filter.filter(dropped))
+
+        self.assertEqual(kept.sample_rate, 0.25)
+        self.assertFalse(hasattr(dropped, 'sample_rate'))
+
+    def test_decision_is_made_once_per_record(self):
+        record = make_record(event='vote')
+        with mock.patch('pollsystem.log_handlers.random.random', side_effect=[0.1, 0.9]) as rand:
+            first = self.filter.filter(record)
+            second = self.filter.filter(record)
+
+        self.assertTrue(first)
+        self.assertEqual(first, second)
+        self.assertEqual(rand.call_count, 1)
+
+
+class QueueFileHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.filename = os.path.join(self.tempdir.name, 'test.log')
+
+    def test_writes_formatted_records_from_listener_thread(self):
+        handler = QueueFileHandler(self.filename)
+        handler.setFormatter(JSONFormatter())
+        handler.handle(make_record('Vote for %s', ('dogs',), event='vote'))
+        handler.close()
+
+        with open(self.filename, encoding='utf-8') as log_file:
+            lines = log_file.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['message'], 'Vote for dogs')
+
+    def test_queues_a_copy_with_rendered_traceback(self):
+        handler = QueueFileHandler(self.filename)
+        handler.setFormatter(JSONFormatter())
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = make_record('Vote for %s', ('cats',), level=logging.ERROR)
+            record.exc_info = sys.exc_info()
+        handler.handle(record)
+        handler.close()
+
+        # Other handlers still see the record as it was logged.
+        self.assertEqual(record.args, ('cats',))
+        self.assertIsNotNone(record.exc_info)
+        with open(self.filename, encoding='utf-8') as log_file:
+            payload = json.loads(log_file.read())
+        self.assertEqual(payload['message'], 'Vote for cats')
+        self.assertIn('ValueError: boom', payload['exc_info'])
+
+    def test_close_with_backed_up_queue_does_not_raise(self):
+        handler = QueueFileHandler(self.filename, queue_size=1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch.object(handler.target, 'handle', side_effect=lambda record: release.wait(5)) as target:
+            handler.handle(make_record())
+            # Wait for the listener to pick up the first record and block on it.
+            while not handler.queue.empty():
+                time.sleep(0.01)
+            handler.handle(make_record())
+
+            with mock.patch.object(handler.listener, 'sentinel_timeout', 0.01):
+                handler.close()
+
+            # Let the abandoned listener drain before the target is restored.
+            release.set()
+            while target.call_count < 2:
+                time.sleep(0.01)
+
+    def test_stream_handler_writes_from_listener_thread(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+        handler.handle(make_record('Vote for %s', ('owls',)))
+        handler.close()
+
+        self.assertEqual(stream.getvalue(), 'INFO Vote for owls\n')
+
+    def test_drops_records_when_queue_is_full(self):
+        handler = QueueFileHandler(self.filename, queue_size=2)
+        self.addCleanup(handler.close)
+        # Keep the listener from starting so nothing drains the queue.
+        with mock.patch.object(handler, '_start_listener'):
+            for _ in range(5):
+                handler.handle(make_record())
+
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_ignores_records_after_close(self):
+        handler = QueueFileHandler(self.filename)
+        handler.close()
+        handler.handle(make_record())
+
+        self.assertTrue(handler.queue.empty())
+
+
+class OpenAPISchemaTests(SimpleTestCase):
+    def setUp(self):
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.schema_file = Path(tempdir.name) / 'openapi.json'
+        override = override_settings(OPENAPI_SCHEMA_FILE=self.schema_file)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.reset_cache()
+        self.addCleanup(self.reset_cache)
+
+    def reset_cache(self):
+        openapi._schema_cache = None
+
+    def test_command_writes_json_and_yaml(self):
+        import yaml
+
+        yaml_file = self.schema_file.with_suffix('.yaml')
+        call_command('generate_openapi_schema', stdout=io.StringIO())
+        call_command('generate_openapi_schema', '--output', str(yaml_file), stdout=io.StringIO())
+
+        schema = json.loads(self.schema_file.read_text())
+        self.assertEqual(schema['info']['title'], openapi.API_INFO['title'])
+        self.assertIn('/polls/trending/', schema['paths'])
+        self.assertEqual(yaml.safe_load(yaml_file.read_text()), schema)
+
+    def test_schema_is_served_with_validators(self):
+        self.schema_file.write_bytes(b'{"swagger": "2.0"}')
+
+        response = self.client.get('/api/schema.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.OPENAPI_SCHEMA_MAX_AGE}', response['Cache-Control'])
+
+        etag = response['ETag']
+        response = self.client.get('/api/schema.json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_missing_schema_is_not_found_without_debug(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/schema.json')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_docs_routes_can_be_disabled(self):
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(importlib.reload, pollsystem.urls)
+        with override_settings(API_DOCS_UI=False):
+            urls = importlib.reload(pollsystem.urls)
+            clear_url_caches()
+            with self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get('/api/docs/')
+
+        names = {getattr(pattern, 'name', None) for pattern in urls.urlpatterns}
+        self.assertNotIn('swagger-docs', names)
+        self.assertNotIn('redoc-docs', names)
+        self.assertIn('openapi-schema', names)
+        self.assertEqual(response.status_code, 404)
+
+
+@trending_settings()
+class TrendingScoreTests(TestCase):
+    def setUp(self):
+        trending._pending.clear()
+        self.now = timezone.now()
+
+    def make_poll(self, question, **kwargs):
+        poll = Poll.objects.create(question=question, **kwargs)
+        Option.objects.create(poll=poll, text='Yes')
+        return poll
+
+    def cast_votes(self, poll, ages):
+        """Create votes ``ages`` hours old and record them incrementally."""
+        option = poll.options.get()
+        for hours in ages:
+            when = self.now - timedelta(hours=hours)
+            vote = Vote.objects.create(option=option)
+            Vote.objects.filter(pk=vote.pk).update(created_at=when)
+            trending.record_vote(poll.id, when)
+
+    def test_single_vote_velocity(self):
+        poll = self.make_poll('Fresh?')
+        self.cast_votes(poll, [0])
+
+        [result] = trending.trending_polls(10)
+        tau_hours = 6 / math.log(2)
+        self.assertEqual(result, poll)
+        self.assertAlmostEqual(result.trending_score, 1 / tau_hours, places=3)
+
+    def test_votes_decay_by_half_life(self):
+        fresh, old = self.make_poll('Fresh?'), self.make_poll('Old?')
+        self.cast_votes(fresh, [0])
+        self.cast_votes(old, [6])
+
+        scores = {poll.question: poll.trending_score for poll in trending.trending_polls(10)}
+        self.assertAlmostEqual(scores['Old?'] / scores['Fresh?'], 0.5, places=3)
+
+    def test_recent_activity_outranks_old_bursts(self):
+        steady, burst = self.make_poll('Steady?'), self.make_poll('Burst?')
+        self.cast_votes(steady, [0, 0.5, 1])
+        self.cast_votes(burst, [72] * 20)
+
+        ranked = trending.trending_polls(10)
+        self.assertEqual([poll.question for poll in ranked], ['Steady?', 'Burst?'])
+
+    def test_incremental_scores_match_rebuild(self):
+        first, second = self.make_poll('First?'), self.make_poll('Second?')
+        self.cast_votes(first, [0, 2, 30, 200])
+        self.cast_votes(second, [1, 1, 1])
+        incremental = dict(PollTrendingScore.objects.values_list('poll_id', 'log_score'))
+
+        self.assertEqual(trending.rebuild_scores(), 2)
+        rebuilt = dict(PollTrendingScore.objects.values_list('poll_id', 'log_score'))
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for poll_id, log_score in incremental.items():
+            self.assertAlmostEqual(log_score, rebuilt[poll_id], places=6)
+
+    def test_rebuild_only_replays_window(self):
+        poll = self.make_poll('Old?')
+        self.cast_votes(poll, [48])
+
+        self.assertEqual(trending.rebuild_scores(since=self.now - timedelta(hours=24)), 0)
+        self.assertFalse(PollTrendingScore.objects.exists())
+
+    def test_expired_polls_are_excluded(self):
+        live = self.make_poll('Live?', expires_at=self.now + timedelta(days=1))
+        expired = self.make_poll('Expired?', expires_at=self.now - timedelta(minutes=1))
+        self.cast_votes(live, [0])
+        self.cast_votes(expired, [0, 0])
+
+        self.assertEqual(trending.trending_polls(10), [live])
+
+    @trending_settings(TRENDING_FLUSH_SECONDS=3600)
+    def test_votes_are_buffered_until_flush(self):
+        poll = self.make_poll('Buffered?')
+        with mock.patch.object(trending, '_flusher_pid', None), \
+                mock.patch.object(trending, '_start_flusher') as start_flusher:
+            self.cast_votes(poll, [0, 0])
+        self.assertFalse(PollTrendingScore.objects.exists())
+        start_flusher.assert_called()
+
+        [result] = trending.trending_polls(10)
+        self.assertEqual(result, poll)
+        self.assertAlmostEqual(result.trending_score, 2 / (6 / math.log(2)), places=3)
+
+    def test_updated_at_moves_on_update(self):
+        poll = self.make_poll('Touched?')
+        self.cast_votes(poll, [0])
+        PollTrendingScore.objects.update(updated_at=self.now - timedelta(days=1))
+        self.cast_votes(poll, [0])
+
+        self.assertGreater(PollTrendingScore.objects.get().updated_at, self.now - timedelta(minutes=1))
+
+
+@trending_settings()
+class TrendingEndpointTests(APITestCase):
+    def setUp(self):
+        trending._pending.clear()
+        self.polls = []
+        for index in range(5):
+            poll = Poll.objects.create(question=f'Poll {index}?')
+            option = Option.objects.create(poll=poll, text='Yes')
+            with self.assertLogs('polls.views', 'INFO'):
+                for _ in range(index + 1):
+                    self.client.post(f'/api/polls/{poll.id}/vote/', {'option_id': option.id}, format='json')
+            self.polls.append(poll)
+
+    def test_vote_action_updates_ranking(self):
+        response = self.client.get('/api/polls/trending/?limit=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([poll['question'] for poll in response.data], ['Poll 4?', 'Poll 3?'])
+        self.assertGreater(response.data[0]['trending_score'], response.data[1]['trending_score'])
+
+    def test_limit_is_capped(self):
+        response = self.client.get('/api/polls/trending/?limit=100')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+    def test_invalid_limit_is_rejected(self):
+        for limit in ('abc', '0', '-1'):
+            with self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get(f'/api/polls/trending/?limit={limit}')
+            self.assertEqual(response.status_code, 400, limit)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Vote partitioning requires PostgreSQL.")
+class VotePartitioningTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.poll = Poll.objects.create(question='Partitioned?')
+        self.option = Option.objects.create(poll=self.poll, text='Yes')
+        for offset in (-2, -1):
+            self.cast_vote(partitioning.month_start(self.now, offset) + timedelta(days=1))
+        self.cast_vote(self.now)
+
+    def cast_vote(self, when):
+        vote = Vote.objects.create(option=self.option)
+        Vote.objects.filter(pk=vote.pk).update(created_at=when)
+        # Run the deferred foreign key checks now; PostgreSQL refuses to alter
+        # a table with pending trigger events.
+        self.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        return vote
+
+    def execute(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            if cursor.description:
+                return cursor.fetchall()
+
+    def count_rows(self, table):
+        return self.execute(f'SELECT COUNT(*) FROM {table}')[0][0]
+
+    def vote_rows(self):
+        return list(Vote.objects.order_by('id').values_list('id', 'option_id', 'created_at'))
+
+    def test_convert_and_revert_keep_rows(self):
+        for strategy in partitioning.STRATEGIES:
+            with self.subTest(strategy=strategy):
+                rows = self.vote_rows()
+                partitioning.partition_vote_table(connection, strategy, months_ahead=1, hash_partitions=4)
+                self.assertEqual(partitioning.get_strategy(connection), strategy)
+                self.assertEqual(self.vote_rows(), rows)
+
+                vote = self.cast_vote(self.now)
+                self.assertGreater(vote.id, rows[-1][0])
+                rows = self.vote_rows()
+
+                partitioning.unpartition_vote_table(connection)
+                self.assertIsNone(partitioning.get_strategy(connection))
+                self.assertEqual(self.vote_rows(), rows)
+                self.assertGreater(self.cast_vote(self.now).id, vote.id)
+
+    def test_future_partitions_take_rows_from_default(self):
+        partitioning.partition_vote_table(connection, 'month', months_ahead=0)
+        ahead = partitioning.month_start(self.now, 2)
+        self.cast_vote(ahead + timedelta(days=1))
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 1)
+
+        created = partitioning.create_future_partitions(connection, 2)
+
+        self.assertEqual(created, [
+            partitioning.month_partition_name(partitioning.month_start(self.now, 1)),
+            partitioning.month_partition_name(ahead),
+        ])
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 0)
+        self.assertEqual(self.count_rows(partitioning.month_partition_name(ahead)), 1)
+        self.assertEqual(Vote.objects.count(), 4)
+
+    def test_archive_moves_old_partitions_to_schema(self):
+        partitioning.partition_vote_table(connection, 'month', months_ahead=0)
+        oldest = partitioning.month_partition_name(partitioning.month_start(self.now, -2))
+
+        archived = partitioning.archive_old_partitions(connection, 1, 'vote_archive')
+
+        self.assertEqual(archived, [oldest])
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(self.count_rows(f'vote_archive.{oldest}'), 1)
+
+        # Archived votes must not keep the poll from being deleted.
+        self.poll.delete()
+        self.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(self.count_rows(f'vote_archive.{oldest}'), 1)
+
+    def test_archive_drops_old_partitions_without_schema(self):
+        partitioning.partition_vote_table(connection, 'month', months_ahead=0)
+        oldest = partitioning.month_partition_name(partitioning.month_start(self.now, -2))
+
+        self.assertEqual(partitioning.archive_old_partitions(connection, 1), [oldest])
+        self.assertEqual(self.execute(f"SELECT to_regclass('{oldest}')"), [(None,)])
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_unique_constraint_without_partition_key_blocks_conversion(self):
+        self.execute('ALTER TABLE polls_vote ADD CONSTRAINT polls_vote_id_option_uniq UNIQUE (id, option_id)')
+
+        with self.assertRaisesMessage(ValueError, 'polls_vote_id_option_uniq'):
+            partitioning.partition_vote_table(connection, 'month')
+        settings_override = {**settings.VOTE_PARTITION_SETTINGS, 'STRATEGY': 'month'}
+        with override_settings(VOTE_PARTITION_SETTINGS=settings_override), \
+                self.assertRaisesMessage(CommandError, 'polls_vote_id_option_uniq'):
+            call_command('maintain_vote_partitions', '--convert', stdout=io.StringIO())
+        self.assertIsNone(partitioning.get_strategy(connection))
+
+        # Hash partitioning on option_id can still enforce it.
+        partitioning.partition_vote_table(connection, 'hash', hash_partitions=4)
+        self.assertEqual(partitioning.get_strategy(connection), 'hash')
@@ -0,0 +1,197 @@
+"""
+Trending polls, ranked by exponentially decayed vote velocity.
+
+Each vote adds ``exp((t - EPOCH) / tau)`` to its poll's score, with ``tau``
+derived from ``POLL_SETTINGS['TRENDING_HALF_LIFE_HOURS']``. Scaling every score
+by the same factor does not change the ranking, so stored scores never need to
+be decayed: the decayed score at ``now`` is ``score * exp(-(now - EPOCH) / tau)``.
+Scores are kept as logarithms so they cannot overflow, and log-space sums
+combine exactly, so votes can be accumulated per process and flushed as a
+single UPDATE per poll.
+"""
+
+import atexit
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import PollTrendingScore, Vote
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+# exp() of anything smaller underflows, which PostgreSQL reports as an error.
+_MIN_EXPONENT = -700.0
+
+# Votes recorded by this process but not yet written, as poll id -> log weight.
+_pending = {}
+_pending_lock = threading.Lock()
+_flusher_pid = None
+
+
+def half_life_hours():
+    return settings.POLL_SETTINGS['TRENDING_HALF_LIFE_HOURS']
+
+
+def _tau_hours():
+    return half_life_hours() / math.log(2)
+
+
+def _log_weight(when):
+    return (when - EPOCH).total_seconds() / 3600 / _tau_hours()
+
+
+def _logaddexp(a, b):
+    return max(a, b) + math.log1p(math.exp(max(-abs(a - b), _MIN_EXPONENT)))
+
+
+def record_vote(poll_id, when=None):
+    """
+    Add one vote cast at ``when`` (default: now) to the poll's score.
+
+    Votes are summed in memory and written out every ``TRENDING_FLUSH_SECONDS``
+    by a background thread, and once more when the process exits. A hot poll
+    then costs one row update per process per interval rather than one per
+    vote, since each update of the indexed ``log_score`` writes a new row
+    version and index entries and holds the row lock. An interval of 0 writes
+    every vote immediately.
+    """
+    weight = _log_weight(when or timezone.now())
+    if settings.POLL_SETTINGS['TRENDING_FLUSH_SECONDS'] <= 0:
+        _add_to_score(poll_id, weight)
+        return
+    with _pending_lock:
+        current = _pending.get(poll_id)
+        _pending[poll_id] = weight if current is None else _logaddexp(current, weight)
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def flush_pending_votes():
+    """Write the votes accumulated by this process to ``PollTrendingScore``."""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    for poll_id in sorted(pending):
+        _add_to_score(poll_id, pending[poll_id])
+
+
+def _start_flusher():
+    """Start this process's flush thread; after a fork the parent's thread is gone."""
+    global _flusher_pid
+    with _pending_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='trending-flush', daemon=True).start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.POLL_SETTINGS['TRENDING_FLUSH_SECONDS'])
+        if not _pending:
+            continue
+        try:
+            flush_pending_votes()
+        except Exception:
+            logger.exception('Failed to flush trending scores')
+        finally:
+            # Connections are per thread; don't hold one open between flushes.
+            connections.close_all()
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _pending:
+        return
+    try:
+        flush_pending_votes()
+    except Exception:
+        logger.exception('Failed to flush trending scores at exit')
+
+
+def _add_to_score(poll_id, weight):
+    now = timezone.now()
+    value = Value(weight, output_field=FloatField())
+    # log(exp(a) + exp(b)), computed as max(a, b) + ln(1 + exp(-|a - b|)).
+    log_score = Greatest(F('log_score'), value) + Ln(
+        Value(1.0) + Exp(Greatest(-Abs(F('log_score') - value), Value(_MIN_EXPONENT)))
+    )
+    if PollTrendingScore.objects.filter(poll_id=poll_id).update(log_score=log_score, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            PollTrendingScore.objects.create(poll_id=poll_id, log_score=weight)
+    except IntegrityError:
+        # A concurrent flush created the row first, or the poll was deleted.
+        PollTrendingScore.objects.filter(poll_id=poll_id).update(log_score=log_score, updated_at=now)
+
+
+def trending_polls(limit):
+    """
+    Return up to ``limit`` unexpired polls, highest score first.
+
+    Each poll gets a ``trending_score`` attribute: its decayed vote velocity
+    in votes per hour.
+    """
+    flush_pending_votes()
+    now = timezone.now()
+    offset = _log_weight(now)
+    tau_hours = _tau_hours()
+    scores = (
+        PollTrendingScore.objects
+        .filter(Q(poll__expires_at__isnull=True) | Q(poll__expires_at__gt=now))
+        .select_related('poll')
+        .prefetch_related('poll__options')
+        .order_by('-log_score')[:limit]
+    )
+
+    polls = []
+    for score in scores:
+        poll = score.poll
+        poll.trending_score = math.exp(max(score.log_score - offset, _MIN_EXPONENT)) / tau_hours
+        polls.append(poll)
+    return polls
+
+
+def rebuild_scores(since=None):
+    """
+    Recompute every poll's score from the votes cast since ``since``.
+
+    Used for cold starts and to recover from drift. Returns the number of
+    polls that received a score. Votes still buffered in this process are
+    discarded, since they are replayed from the vote table. Buffers in other
+    processes cannot be reached, so votes they hold are counted twice once
+    flushed; run a rebuild while the web workers are stopped, or accept up
+    to one flush interval of double counting.
+    """
+    with _pending_lock:
+        _pending.clear()
+
+    votes = Vote.objects.values_list('option__poll_id', 'created_at')
+    if since is not None:
+        votes = votes.filter(created_at__gte=since)
+
+    log_scores = {}
+    for poll_id, created_at in votes.iterator():
+        weight = _log_weight(created_at)
+        current = log_scores.get(poll_id)
+        log_scores[poll_id] = weight if current is None else _logaddexp(current, weight)
+
+    with transaction.atomic():
+        PollTrendingScore.objects.all().delete()
+        PollTrendingScore.objects.bulk_create(
+            [PollTrendingScore(poll_id=poll_id, log_score=score) for poll_id, score in log_scores.items()],
+            batch_size=1000,
+        )
+    return len(log_scores)
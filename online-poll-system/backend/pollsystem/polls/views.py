@@ -1,8 +1,14 @@
+import logging
+
+from django.conf import settings
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import Poll, Option, Vote
-from .serializers import PollSerializer, VoteSerializer
+from .serializers import PollSerializer, TrendingPollSerializer, VoteSerializer
+from .trending import record_vote, trending_polls
+
+logger = logging.getLogger(__name__)
 
 
 class PollViewSet(viewsets.ModelViewSet):
@@ -21,4 +27,23 @@ class PollViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Invalid option'}, status=status.HTTP_400_BAD_REQUEST)
 
         Vote.objects.create(option=option)
+        record_vote(option.poll_id)
+        logger.info(
+            'Vote recorded',
+            extra={'event': 'vote', 'poll_id': pk, 'option_id': option.id},
+        )
         return Response({'message': 'Vote recorded'}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        max_results = settings.POLL_SETTINGS['TRENDING_MAX_RESULTS']
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), max_results)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        polls = trending_polls(limit)
+        serializer = TrendingPollSerializer(polls, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
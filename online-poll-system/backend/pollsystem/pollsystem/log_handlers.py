@@ -0,0 +1,206 @@
+"""
+Logging helpers for the poll system.
+
+``QueueFileHandler`` and ``QueueStreamHandler`` keep I/O off the request
+thread: ``emit`` only enqueues the record, and a background ``QueueListener``
+formats it and writes it to a size-rotated file or to the console.
+``JSONFormatter`` renders one JSON object per line, and ``SamplingFilter``
+drops a configurable share of high-volume events.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueListener, RotatingFileHandler
+
+
+_exception_formatter = logging.Formatter()
+
+# Attributes present on every LogRecord; anything else came in via ``extra``.
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'sample_rate',
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        payload = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+            'message': record.getMessage(),
+        }
+        sample_rate = getattr(record, 'sample_rate', None)
+        if sample_rate is not None:
+            payload['sample_rate'] = sample_rate
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Rendered before the record was queued; see QueuedHandler.prepare.
+            payload['exc_info'] = record.exc_text
+        if record.stack_info:
+            payload['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records tagged with a sampled event.
+
+    ``rates`` maps an event name (passed as ``extra={'event': ...}``) to the
+    probability of keeping it. Kept records are annotated with
+    ``sample_rate`` so counts can be scaled back up downstream. Untagged
+    records and records at WARNING or above always pass.
+
+    The decision is stored on the record, so when the filter is attached to
+    several handlers every sink keeps or drops the same records.
+    """
+
+    def __init__(self, rates=None, name=''):
+        super().__init__(name)
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        keep = getattr(record, '_sampled', None)
+        if keep is None:
+            keep = self._decide(record)
+            record._sampled = keep
+        return keep
+
+    def _decide(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if rate <= 0 or random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class _QueueListener(QueueListener):
+    """``QueueListener`` that waits for room for its stop sentinel."""
+
+    sentinel_timeout = 5
+
+    def enqueue_sentinel(self):
+        # The stock version uses put_nowait, which raises queue.Full when the
+        # queue is backed up at shutdown.
+        self.queue.put(self._sentinel, timeout=self.sentinel_timeout)
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Enqueue records for a background thread that passes them to ``target``.
+
+    This is a plain ``Handler`` that owns its queue and ``QueueListener``
+    rather than a ``QueueHandler`` subclass, because ``dictConfig`` on Python
+    3.12+ builds ``QueueHandler`` subclasses its own way.
+
+    The listener thread is started lazily on the first record emitted by each
+    process, so it survives servers that fork workers after loading settings.
+    If the queue is full the record is dropped rather than blocking the
+    request; the number of dropped records is kept in ``dropped``.
+    """
+
+    def __init__(self, target, queue_size=10000):
+        super().__init__()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.target = target
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, in the target handler.
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Work on a copy: the same record is passed on to other handlers.
+        # Resolve the message and traceback now, since the arguments may be
+        # mutated and the frames freed once the caller returns; everything
+        # else is deferred to the listener, as in ``QueueHandler.prepare``.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record):
+        if self._closed:
+            return
+        if self._pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            # A listener inherited across fork has no running thread here.
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self.listener = _QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def close(self):
+        with self.lock:
+            self._closed = True
+            listener, self.listener = self.listener, None
+            owned = self._pid == os.getpid()
+            self._pid = None
+        if listener is not None and owned:
+            try:
+                listener.stop()
+            except queue.Full:
+                # The listener is still draining; it is a daemon thread, so
+                # leave it rather than hang the process on exit.
+                pass
+        self.target.close()
+        super().close()
+
+
+class QueueFileHandler(QueuedHandler):
+    """Write records to a size-rotated file from a background thread."""
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 queue_size=10000, encoding='utf-8'):
+        target = RotatingFileHandler(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding=encoding,
+            delay=True,
+        )
+        super().__init__(target, queue_size)
+
+
+class QueueStreamHandler(QueuedHandler):
+    """Write records to ``stream`` (default ``sys.stderr``) from a background thread."""
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(logging.StreamHandler(stream), queue_size)
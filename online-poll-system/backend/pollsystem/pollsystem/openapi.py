@@ -0,0 +1,107 @@
+"""
+OpenAPI schema serving for the poll system.
+
+The schema is generated once at release time by the ``generate_openapi_schema``
+management command and served from memory, so requests never re-introspect
+serializers and views. drf_yasg is only imported when the schema has to be
+generated or a documentation page is rendered.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+
+
+API_INFO = {
+    'title': "Online Poll System API",
+    'default_version': 'v1',
+    'description': "REST API for online polling system with real-time voting",
+    'contact_email': "admin@pollsystem.com",
+}
+
+_schema_lock = threading.Lock()
+_schema_cache = None
+
+
+def get_api_info():
+    """Build the drf_yasg ``Info`` object describing this API."""
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title=API_INFO['title'],
+        default_version=API_INFO['default_version'],
+        description=API_INFO['description'],
+        contact=openapi.Contact(email=API_INFO['contact_email']),
+    )
+
+
+def generate_schema():
+    """Introspect the API and return the schema as a drf_yasg ``Swagger`` object."""
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    generator = OpenAPISchemaGenerator(get_api_info())
+    return generator.get_schema(request=None, public=True)
+
+
+def _load_schema():
+    """Return ``(body, etag)`` for the JSON schema, reading it at most once."""
+    global _schema_cache
+    if _schema_cache is None:
+        with _schema_lock:
+            if _schema_cache is None:
+                path = settings.OPENAPI_SCHEMA_FILE
+                if path.exists():
+                    body = path.read_bytes()
+                elif settings.DEBUG:
+                    # Development fallback so the docs work before the
+                    # schema has been generated.
+                    from drf_yasg.codecs import OpenAPICodecJson
+
+                    body = OpenAPICodecJson(validators=[]).encode(generate_schema())
+                else:
+                    return None
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                _schema_cache = (body, etag)
+    return _schema_cache
+
+
+def schema_view(request):
+    """Serve the precomputed OpenAPI schema from memory."""
+    schema = _load_schema()
+    if schema is None:
+        raise Http404("OpenAPI schema has not been generated.")
+    body, etag = schema
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
+
+
+def _docs_view(renderer_path):
+    def view(request):
+        from django.utils.module_loading import import_string
+
+        renderer = import_string(renderer_path)()
+        context = {'request': request}
+        renderer.set_context(context)
+        context['title'] = API_INFO['title']
+        context['version'] = API_INFO['default_version']
+        response = HttpResponse(render_to_string(renderer.template, context, request))
+        patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+        return response
+
+    return view
+
+
+# The documentation pages are static shells that fetch the schema from
+# ``schema_view`` (see ``SPEC_URL`` in settings), so rendering them is cheap.
+swagger_view = _docs_view('drf_yasg.renderers.SwaggerUIRenderer')
+redoc_view = _docs_view('drf_yasg.renderers.ReDocRenderer')
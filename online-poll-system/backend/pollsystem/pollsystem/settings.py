@@ -37,12 +37,17 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'corsheaders',
-    'drf_yasg',
     
     # Local apps
     'polls',
 ]
 
+# drf_yasg only provides the templates and static assets for the docs pages;
+# disable it to drop the Swagger/ReDoc UI and serve only the schema file.
+API_DOCS_UI = config('API_DOCS_UI', default=True, cast=bool)
+if API_DOCS_UI:
+    INSTALLED_APPS.append('drf_yasg')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -86,6 +91,9 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='password'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # polls/migrations/0001_initial.py predates the current models, so
+        # build the test database straight from the models.
+        'TEST': {'MIGRATE': False},
     }
 }
 
@@ -95,6 +103,7 @@ if config('USE_SQLITE', default=False, cast=bool):
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIGRATE': False},
         }
     }
 
@@ -227,6 +236,7 @@ CORS_PREFLIGHT_MAX_AGE = 86400  # 24 hours
 
 # Swagger/OpenAPI Configuration
 SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
     'SECURITY_DEFINITIONS': {
         'basic': {
             'type': 'basic'
@@ -250,9 +260,14 @@ SWAGGER_SETTINGS = {
 }
 
 REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
     'LAZY_RENDERING': False,
 }
 
+# Precomputed schema written by `manage.py generate_openapi_schema`
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'static' / 'openapi.json'
+OPENAPI_SCHEMA_MAX_AGE = config('OPENAPI_SCHEMA_MAX_AGE', default=3600, cast=int)
+
 
 # Security Settings (for production)
 if not DEBUG:
@@ -268,6 +283,41 @@ if not DEBUG:
 
 
 # Logging Configuration
+# With LOG_ASYNC the request thread only enqueues records; a background
+# listener thread formats them and writes the rotating file and console.
+LOG_ASYNC = config('LOG_ASYNC', default=True, cast=bool)
+LOG_FILE_MAX_BYTES = config('LOG_FILE_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+LOG_FILE_BACKUP_COUNT = config('LOG_FILE_BACKUP_COUNT', default=5, cast=int)
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+POLLS_LOG_LEVEL = config('POLLS_LOG_LEVEL', default='DEBUG' if DEBUG else 'INFO')
+
+# Fraction of high-volume events to keep, keyed by the ``event`` extra.
+LOG_SAMPLE_RATES = {
+    'vote': config('LOG_SAMPLE_RATE_VOTE', default=1.0, cast=float),
+}
+
+if LOG_ASYNC:
+    LOG_FILE_HANDLER = {
+        'class': 'pollsystem.log_handlers.QueueFileHandler',
+        'max_bytes': LOG_FILE_MAX_BYTES,
+        'backup_count': LOG_FILE_BACKUP_COUNT,
+        'queue_size': LOG_QUEUE_SIZE,
+    }
+    LOG_CONSOLE_HANDLER = {
+        'class': 'pollsystem.log_handlers.QueueStreamHandler',
+        'queue_size': LOG_QUEUE_SIZE,
+    }
+else:
+    LOG_FILE_HANDLER = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'maxBytes': LOG_FILE_MAX_BYTES,
+        'backupCount': LOG_FILE_BACKUP_COUNT,
+        'encoding': 'utf-8',
+    }
+    LOG_CONSOLE_HANDLER = {
+        'class': 'logging.StreamHandler',
+    }
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -280,18 +330,29 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'pollsystem.log_handlers.JSONFormatter',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'pollsystem.log_handlers.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
     },
     'handlers': {
         'file': {
+            **LOG_FILE_HANDLER,
             'level': 'INFO',
-            'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
-            'formatter': 'verbose',
+            'formatter': 'json',
+            'filters': ['sampling'],
         },
         'console': {
+            **LOG_CONSOLE_HANDLER,
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
             'formatter': 'simple',
+            'filters': ['sampling'],
         },
     },
     'root': {
@@ -306,7 +367,7 @@ LOGGING = {
         },
         'polls': {
             'handlers': ['file', 'console'],
-            'level': 'DEBUG',
+            'level': POLLS_LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -350,6 +411,19 @@ POLL_SETTINGS = {
     'MAX_POLL_DURATION_DAYS': config('MAX_POLL_DURATION_DAYS', default=30, cast=int),
     'ALLOW_ANONYMOUS_VOTING': config('ALLOW_ANONYMOUS_VOTING', default=True, cast=bool),
     'RATE_LIMIT_VOTES_PER_IP': config('RATE_LIMIT_VOTES_PER_IP', default=100, cast=int),
+    'TRENDING_HALF_LIFE_HOURS': config('TRENDING_HALF_LIFE_HOURS', default=6, cast=float),
+    'TRENDING_MAX_RESULTS': config('TRENDING_MAX_RESULTS', default=50, cast=int),
+    'TRENDING_FLUSH_SECONDS': config('TRENDING_FLUSH_SECONDS', default=5, cast=float),  # 0 writes every vote
+}
+
+# Opt-in PostgreSQL partitioning of the vote table (see polls/partitioning.py).
+# STRATEGY is '' (plain table), 'month' (range on created_at) or 'hash' (on option_id).
+VOTE_PARTITION_SETTINGS = {
+    'STRATEGY': config('VOTE_PARTITION_STRATEGY', default=''),
+    'HASH_PARTITIONS': config('VOTE_HASH_PARTITIONS', default=16, cast=int),
+    'MONTHS_AHEAD': config('VOTE_PARTITION_MONTHS_AHEAD', default=3, cast=int),
+    'RETAIN_MONTHS': config('VOTE_PARTITION_RETAIN_MONTHS', default=0, cast=int),  # 0 keeps everything
+    'ARCHIVE_SCHEMA': config('VOTE_ARCHIVE_SCHEMA', default='archive'),
 }
 
 import os
@@ -1,9 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
+from django.conf import settings
 from django.http import HttpResponse
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
+from . import openapi
 
 # Simple home view for root URL
 def home_view(request):
@@ -36,22 +35,15 @@ def home_view(request):
     </html>
     ''')
 
-# Swagger configuration
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Online Poll System API",
-        default_version='v1',
-        description="REST API for online polling system with real-time voting",
-        contact=openapi.Contact(email="admin@pollsystem.com"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
-
 urlpatterns = [
     path('', home_view, name='home'),  # Root URL fix
     path('admin/', admin.site.urls),
     path('api/', include('polls.urls')),
-    path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-docs'),
-    path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='redoc-docs'),
-]
\ No newline at end of file
+    path('api/schema.json', openapi.schema_view, name='openapi-schema'),
+]
+
+if settings.API_DOCS_UI:
+    urlpatterns += [
+        path('api/docs/', openapi.swagger_view, name='swagger-docs'),
+        path('api/redoc/', openapi.redoc_view, name='redoc-docs'),
+    ]
\ No newline at end of file